@@ -1,112 +1,441 @@
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from joblib import load
-from urllib.parse import urlparse # IMPORTANT: Add urlparse import here
+from urllib.parse import urlparse
+from concurrent.futures import Future
+from enum import IntEnum
+import functools
 import os
 import json
-import pandas as pd
+import queue
+import re
+import threading
+import time
 import numpy as np
+import orjson
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    # ONNX Runtime is optional; without it the API serves the pickled sklearn model
+    ort = None
 
 # Assuming feature_extraction is in the same directory structure
-from feature_extraction import extract_features_from_url 
+from feature_extraction import FEATURE_NAMES, extract_feature_vector, is_ip_address
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson (faster than stdlib json, serializes NumPy scalars)."""
+
+    OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.OPTIONS).decode()
 
-app = Flask(__name__)
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round trip of the base implementation
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=self.OPTIONS), mimetype="application/json")
+
+class PhishingAPI(Flask):
+    json_provider_class = OrjsonProvider
+
+app = PhishingAPI(__name__)
 
 # --- Configuration ---
 MODEL_DIR = 'backend/models' 
 MODEL_FILENAME = 'phishing_model.pkl'
-FEATURES_FILENAME = 'feature_metadata.json'
+ONNX_MODEL_FILENAME = 'phishing_model.onnx' # Written by export_onnx.py; preferred when present
+FEATURES_FILENAME = 'feature_metadata.json' # Only read for models saved without their feature list
 MODEL_FULL_PATH = os.path.join(MODEL_DIR, MODEL_FILENAME)
+ONNX_MODEL_FULL_PATH = os.path.join(MODEL_DIR, ONNX_MODEL_FILENAME)
 FEATURES_FULL_PATH = os.path.join(MODEL_DIR, FEATURES_FILENAME)
+ONNX_INTRA_OP_THREADS = 1 # One thread per call keeps single-URL latency low; workers provide parallelism
+MODEL_BUNDLE_SCHEMA = 1 # Version of the {'model', 'features', 'schema'} bundle written by train_model.py
 
 # --- Global Variables for ML Model and Features ---
 model = None
 feature_names = None
+feature_indexer = None # Gathers model-ordered columns from a FEATURE_NAMES-ordered vector (None = same order)
 ML_THRESHOLD = 0.58 # ADJUSTED: Lowered threshold to 0.58 to catch the 'amazon-support.online' False Negative.
 
+# --- Batching Configuration ---
+BATCH_MAX_SIZE = 32 # Max single-URL requests coalesced into one model call
+BATCH_TIMEOUT_MS = 10 # Max time a batch waits for a concurrent request that has not been queued yet
+MAX_BATCH_URLS = 1000 # Max URLs accepted by a single /predict_batch call
+
+# --- Caching Configuration ---
+PREDICTION_CACHE_SIZE = 100_000 # Most recent normalized URLs whose ML result is kept per process
+
+# --- Rule-Based Configuration ---
+_MAX_URL_LEN = 75 # URLs longer than this are flagged by rule_based_check
+
+class OnnxModel:
+    """Serves an exported ONNX model through the same predict_proba() interface as sklearn."""
+
+    def __init__(self, path, intra_op_num_threads=ONNX_INTRA_OP_THREADS):
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.n_features_in_ = model_input.shape[1]
+        # The graph outputs (labels, probabilities); only the probability tensor is fetched
+        self.output_names = [self.session.get_outputs()[1].name]
+        # Input column order, embedded by export_onnx.py (None for older exports)
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.feature_names = json.loads(metadata['feature_names']) if 'feature_names' in metadata else None
+
+    def predict_proba(self, X):
+        return self.session.run(self.output_names, {self.input_name: X})[0]
+
+@functools.cache
+def _load_model(path):
+    """
+    Loads the model once per process; repeated startups/reloads reuse the same object.
+    Returns (model, feature_names), where feature_names is None if the file does not carry them.
+    """
+    if path.endswith('.onnx'):
+        onnx_model = OnnxModel(path)
+        return onnx_model, onnx_model.feature_names
+    # Memory-map the pickle's NumPy arrays (read-only) instead of reading them onto the heap.
+    # Models that keep their nodes in such arrays (HistGradientBoosting) stay backed by the OS
+    # page cache, but sklearn's RandomForest trees copy their nodes into private buffers when
+    # unpickled, so for the default model this only saves the read() copy. Sharing one model
+    # across Gunicorn workers comes from preload_app in gunicorn.conf.py, not from the mapping.
+    artifact = load(path, mmap_mode='r')
+    if isinstance(artifact, dict):
+        # Bundle written by train_model.py: the model and its feature list, saved atomically together
+        if artifact.get('schema') != MODEL_BUNDLE_SCHEMA:
+            raise ValueError(f"Unsupported model bundle schema {artifact.get('schema')!r} (expected {MODEL_BUNDLE_SCHEMA}).")
+        return artifact['model'], list(artifact['features'])
+    # Bare model pickled by an older train_model.py
+    return artifact, None
+
 def load_ml_resources():
     """Loads the trained model and the feature list upon API startup."""
-    global model, feature_names
+    global model, feature_names, feature_indexer
     
-    # 1. Load the Model
+    # 1. Load the Model (the compiled ONNX export if available, else the pickle)
+    model_path = MODEL_FULL_PATH
+    if ort is not None and os.path.exists(ONNX_MODEL_FULL_PATH):
+        if os.path.exists(MODEL_FULL_PATH) and os.path.getmtime(ONNX_MODEL_FULL_PATH) < os.path.getmtime(MODEL_FULL_PATH):
+            print(f"WARNING: {ONNX_MODEL_FULL_PATH} is older than {MODEL_FULL_PATH}; ignoring it (re-run export_onnx.py).")
+        else:
+            model_path = ONNX_MODEL_FULL_PATH
+    bundled_feature_names = None
     try:
-        model = load(MODEL_FULL_PATH)
-        print(f"ML Model loaded successfully from {MODEL_FULL_PATH}.")
+        model, bundled_feature_names = _load_model(model_path)
+        print(f"ML Model loaded successfully from {model_path}.")
     except Exception as e:
-        print(f"ERROR: Failed to load ML model from {MODEL_FULL_PATH}. Ensure train_model.py was run.")
+        print(f"ERROR: Failed to load ML model from {model_path}. Ensure train_model.py was run.")
         print(f"Details: {e}")
         model = None
         
-    # 2. Load the Feature Metadata
-    try:
-        with open(FEATURES_FULL_PATH, 'r') as f:
-            feature_names = json.load(f)
-        print(f"Feature list loaded successfully. Total features: {len(feature_names)}")
-    except Exception as e:
-        print(f"ERROR: Failed to load feature metadata from {FEATURES_FULL_PATH}. Ensure train_model.py was run.")
-        print(f"Details: {e}")
-        feature_names = None
+    # 2. Load the Feature Metadata (saved in the model file itself; older models use the JSON file)
+    if bundled_feature_names is not None:
+        feature_names = bundled_feature_names
+        print(f"Feature list loaded successfully from {model_path}. Total features: {len(feature_names)}")
+    else:
+        try:
+            with open(FEATURES_FULL_PATH, 'r') as f:
+                feature_names = json.load(f)
+            print(f"Feature list loaded successfully. Total features: {len(feature_names)}")
+        except Exception as e:
+            print(f"ERROR: Failed to load feature metadata from {FEATURES_FULL_PATH}. Ensure train_model.py was run.")
+            print(f"Details: {e}")
+            feature_names = None
+
+    # Map the model's column order onto the extractor's vector once, instead of per request.
+    # A feature the extractor cannot produce is caught here rather than as a KeyError per request.
+    feature_indexer = None
+    if feature_names is not None and list(feature_names) != FEATURE_NAMES:
+        missing = [name for name in feature_names if name not in FEATURE_NAMES]
+        if missing:
+            print(f"ERROR: Model expects features that feature_extraction.py does not produce: {missing}")
+            feature_names = None
+        else:
+            feature_indexer = np.array([FEATURE_NAMES.index(name) for name in feature_names], dtype=np.intp)
+
+    # 3. Let the model take raw NumPy rows, so pandas stays off the request path
+    # (the cached model loses feature_names_in_ after its first successful check)
+    fitted_names = getattr(model, 'feature_names_in_', None)
+    if model is not None and feature_names is not None:
+        if model.n_features_in_ != len(feature_names) or (
+            fitted_names is not None and list(fitted_names) != list(feature_names)
+        ):
+            print("ERROR: Feature metadata does not match the columns the model was trained on.")
+            model = None
+        elif fitted_names is not None:
+            # The column order is verified once here; without this attribute sklearn no longer
+            # warns that a plain ndarray "does not have valid feature names" on every call.
+            del model.feature_names_in_
+
+    # 4. Warm up with a dummy prediction so the first real request does not pay for
+    # lazy imports and cold caches inside the model
+    if model is not None and feature_names is not None:
+        model.predict_proba(np.zeros((1, len(feature_names)), dtype=np.float32))
+
+    # 5. Cached predictions belong to the previously loaded model
+    _cached_ml_prediction.cache_clear()
 
 # --- Prediction Functions ---
 
+class RuleReason(IntEnum):
+    """Reason codes returned by run_rule_checks()."""
+    NONE = 0
+    LONG_URL = 1
+    AT_SYMBOL = 2
+    IP_HOSTNAME = 3
+
+_RULE_REASON_TEXT = {
+    RuleReason.LONG_URL: "Rule-Based (URL is excessively long)",
+    RuleReason.AT_SYMBOL: "Rule-Based (Contains '@' symbol for obfuscation)",
+    RuleReason.IP_HOSTNAME: "Rule-Based (Hostname is an IP address)",
+}
+
+# '@' anywhere, OR a host shaped like a dotted quad (four dot-separated alphanumeric parts,
+# optional port) after an optional scheme and '//', which is where urlparse() finds a netloc.
+# The regex is only a prefilter: the shaped host goes to feature_extraction.is_ip_address(),
+# the same check behind the IpAddress feature, so zero-padded, octal or hex octets
+# ('01.2.3.4', '1.2.3.0x4') are judged the same way.
+_HOST_PART = r'[0-9A-Za-z]*'
+_HEURISTIC_RE = re.compile(
+    r'(@)|^(?:[A-Za-z][A-Za-z0-9+.\-]*:)?//(' + _HOST_PART + r'(?:\.' + _HOST_PART + r'){3}(?::[^/?#@]*)?)(?:[/?#]|$)'
+)
+
+def _needs_urlparse(url):
+    """
+    True if urlparse() would clean the URL up before finding its netloc (it strips leading
+    control/space characters and removes tabs and newlines), so the regex may not see the
+    same host as the IpAddress feature.
+    """
+    return '//' in url and (url[:1] <= ' ' or not url.isprintable())
+
+def run_rule_checks(url):
+    """
+    Runs every rule in one pass and returns the RuleReason of the first rule that fires.
+    The length check stays first (O(1)); '@' and the IP hostname share one compiled regex.
+    """
+    # 1. Check for long URL (Rule based on original project requirements)
+    if len(url) > _MAX_URL_LEN:
+        return RuleReason.LONG_URL
+
+    # 2./3. '@' symbol (used to embed credentials or confuse users) or raw IP hostname
+    match = _HEURISTIC_RE.search(url)
+    if match is not None:
+        if match.group(1) or '@' in url:
+            # A dotted-quad match at the start ends the search, so '@' later in the URL is
+            # checked here; the '@' rule takes precedence, as it always has
+            return RuleReason.AT_SYMBOL
+        if is_ip_address(match.group(2)):
+            return RuleReason.IP_HOSTNAME
+    if _needs_urlparse(url) and is_ip_address(urlparse(url).netloc):
+        # e.g. ' http://1.2.3.4/' or 'http://1.2.3.\t4/': use the netloc the feature sees
+        return RuleReason.IP_HOSTNAME
+    return RuleReason.NONE
+
 def rule_based_check(url):
     """
     Performs fast, high-confidence checks based on classic phishing indicators.
     Returns (True, reason) if phishing, or (False, None) otherwise.
     """
-    # 1. Check for the '@' symbol (used to embed credentials or confuse users)
-    if '@' in url:
-        return True, "Rule-Based (Contains '@' symbol for obfuscation)"
-    
-    # 2. Check for long URL (Rule based on original project requirements)
-    if len(url) > 75:
-        return True, "Rule-Based (URL is excessively long)"
-        
-    # 3. Check for IP address in the hostname (malicious sites often use raw IPs)
-    import re
-    # We need to import urlparse inside or pass it in, but since we use it globally,
-    # let's just make sure it's imported at the top.
-    host = urlparse(url).netloc
-    if re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$", host):
-        return True, "Rule-Based (Hostname is an IP address)"
-        
-    return False, None
+    code = run_rule_checks(url)
+    if code is RuleReason.NONE:
+        return False, None
+    return True, _RULE_REASON_TEXT[code]
+
+def build_feature_vector(url):
+    """Extracts features from the URL in the EXACT ORDER the model expects."""
+    # This returns the 48 features as an int32 array ordered like FEATURE_NAMES
+    vector = extract_feature_vector(url)
+    if feature_indexer is not None:
+        # The model was trained on a different column order (from the metadata JSON)
+        vector = vector[feature_indexer]
+    return vector
+
+def predict_phishing_probas(feature_rows):
+    """
+    Runs ONE model call over a batch of feature vectors.
+    Returns an array with P(class 1 = phishing) for every row.
+    """
+    # Rows are copied into a single contiguous 2-D array so the tree ensemble
+    # traverses the whole batch at once instead of one row per call. This copy is also
+    # the one place the int32 feature vectors are cast to the model's float32 input.
+    X_predict = np.empty((len(feature_rows), len(feature_names)), dtype=np.float32)
+    for i, row in enumerate(feature_rows):
+        X_predict[i] = row
+
+    # prediction_proba returns [[P(class 0), P(class 1)], ...]
+    return model.predict_proba(X_predict)[:, 1]
+
+def label_prediction(phishing_proba):
+    """Applies the adjusted threshold and returns (prediction, probability, reason)."""
+    if phishing_proba >= ML_THRESHOLD:
+        prediction = 'phishing'
+    else:
+        prediction = 'safe'
+
+    return prediction, phishing_proba, "ML Model Prediction"
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-URL predictions into one batched model call.
+
+    Each request thread enqueues its feature vector and blocks on a Future. A background
+    thread takes every vector already queued (up to `max_batch_size`) and resolves their
+    Futures from a single predict_proba() call. It only waits for more, at most `timeout_ms`,
+    while another submitted request has not reached the queue yet, so a lone request (one
+    click in the extension) goes straight to the model. Under load, the requests that arrive
+    during one model call form the next batch.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, timeout_ms=10):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pending = 0 # Submitted but not yet resolved (guarded by _pending_lock)
+        self._pending_lock = threading.Lock()
+
+    def submit(self, feature_vector):
+        """Queues one feature vector and blocks until its probability is available."""
+        self._ensure_worker()
+        future = Future()
+        with self._pending_lock:
+            self._pending += 1
+        self._queue.put((feature_vector, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        # Started lazily (not at import) so every forked Gunicorn worker gets its own thread
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.timeout
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            # The queue is drained; wait only if a submitter is still on its way to put()
+            remaining = deadline - time.monotonic()
+            with self._pending_lock:
+                in_flight = self._pending > len(batch)
+            if not in_flight or remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _resolved(self, batch):
+        with self._pending_lock:
+            self._pending -= len(batch)
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                probas = self.predict_fn([vector for vector, _ in batch])
+            except Exception as e:
+                self._resolved(batch)
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self._resolved(batch)
+            for (_, future), proba in zip(batch, probas):
+                future.set_result(proba)
+
+batcher = MicroBatcher(predict_phishing_probas, max_batch_size=BATCH_MAX_SIZE, timeout_ms=BATCH_TIMEOUT_MS)
+
+class PredictionError(Exception):
+    """
+    Raised by ml_batch_prediction() and _cached_ml_prediction() when the model cannot score
+    (so failed predictions are never cached).
+    """
 
 def ml_based_prediction(url):
     """
     Extracts features from the URL and uses the ML model for prediction.
+    Concurrent callers are grouped into one model call by the micro-batcher.
     Returns prediction ('safe' or 'phishing') and probability.
     """
     if not model or not feature_names:
         return 'error', 0.0, "ML model or feature metadata not loaded."
 
-    # 1. Extract raw features using the imported script
-    # This returns a dictionary of feature names and values (e.g., {'UrlLength': 42, ...})
-    raw_features = extract_features_from_url(url)
-    
-    # 2. Create the feature vector in the EXACT ORDER the model expects
-    # We use the feature_names list loaded from the JSON
-    try:
-        # Create a list of feature values in the correct order
-        feature_vector = [raw_features[name] for name in feature_names]
-        
-        # Convert to a DataFrame row for prediction
-        X_predict = pd.DataFrame([feature_vector], columns=feature_names)
-    except KeyError as e:
-        # This handles cases where a feature expected by the model is missing 
-        # from the extraction logic (should not happen if feature_extraction.py is complete)
-        return 'error', 0.0, f"Missing feature required by model: {e}"
-
-    # 3. Predict probability for class 1 (phishing)
-    # prediction_proba returns [[P(class 0), P(class 1)]]
-    phishing_proba = model.predict_proba(X_predict)[0][1]
-    
-    # 4. Apply the adjusted threshold
-    if phishing_proba >= ML_THRESHOLD:
-        prediction = 'phishing'
-    else:
-        prediction = 'safe'
-        
-    return prediction, float(phishing_proba), "ML Model Prediction"
+    return label_prediction(batcher.submit(build_feature_vector(url)))
+
+def ml_batch_prediction(urls):
+    """
+    Same as ml_based_prediction, but for a list of URLs scored in a single model call.
+    Returns a list of (prediction, probability, reason) tuples; raises PredictionError if the
+    model is not loaded.
+    """
+    if not model or not feature_names:
+        raise PredictionError("ML model or feature metadata not loaded.")
+
+    feature_rows = [build_feature_vector(url) for url in urls]
+    return [label_prediction(proba) for proba in predict_phishing_probas(feature_rows)]
+
+# RFC 3986 scheme syntax; anything else before the first '://' (a protocol-relative host, a
+# path holding a redirect URL) is left untouched
+_SCHEME_RE = re.compile(r'[A-Za-z][A-Za-z0-9+.\-]*\Z')
+
+def normalize_url(url):
+    """
+    Canonical cache key for a URL: the scheme is lower-cased. The key is also what the model
+    scores, so nothing that feeds a feature is rewritten (even surrounding whitespace counts
+    towards UrlLength); extract_feature_vector(normalize_url(u)) equals extract_feature_vector(u).
+    """
+    scheme, sep, rest = url.partition('://')
+    if sep and not scheme.islower() and _SCHEME_RE.match(scheme):
+        url = scheme.lower() + sep + rest
+    return url
+
+@functools.lru_cache(maxsize=PREDICTION_CACHE_SIZE)
+def _cached_ml_prediction(url):
+    """
+    ml_based_prediction() for a normalized URL that passed the rule-based checks.
+    Returns (prediction, probability, reason). Repeated URLs (blacklists, bot scans) skip
+    feature extraction and the model entirely. Only URLs the model scores are cached: they are
+    at most _MAX_URL_LEN characters, so the cache stays small however long the rejected URLs are.
+    """
+    prediction, proba, reason = ml_based_prediction(url)
+    if prediction == 'error':
+        raise PredictionError(reason)
+    return prediction, proba, reason
+
+# --- Response Helpers ---
+
+def rule_based_response(reason):
+    """Response body for a URL flagged by rule_based_check."""
+    return {
+        "prediction": "phishing",
+        "reason": reason,
+        "phishing_proba": None # No ML proba needed for rule-based detection
+    }
+
+def ml_response(prediction, proba, reason):
+    """Response body for a URL scored by the ML model."""
+    return {
+        "prediction": prediction,
+        "reason": reason,
+        # NumPy floats are serialized directly by the orjson provider
+        "phishing_proba": round(proba, 4)
+    }
 
 # --- Flask Routes ---
 
@@ -119,36 +448,85 @@ def predict():
         return jsonify({"error": "Missing JSON in request"}), 400
     
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"error": "JSON body must be an object"}), 400
     url = data.get('url')
     
-    if not url:
+    if not url or not isinstance(url, str):
         return jsonify({"error": "Missing 'url' field in request"}), 400
     
-    # --- Step 1: Rule-Based Check (Fast and High-Confidence) ---
+    # --- Rule-Based Check (Fast and High-Confidence) ---
+    # Runs outside the cache: it is cheaper than a cache lookup, and caching would keep every
+    # (arbitrarily long) rejected URL in memory.
     is_phishing, reason = rule_based_check(url)
-    
     if is_phishing:
-        # If any rule is triggered, return PHISHING immediately
-        response = {
-            "prediction": "phishing",
-            "reason": reason,
-            "phishing_proba": None # No ML proba needed for rule-based detection
-        }
-        return jsonify(response)
-        
-    # --- Step 2: ML-Based Prediction ---
-    prediction, proba, reason = ml_based_prediction(url)
-    
-    if prediction == 'error':
-        return jsonify({"error": reason}), 500
-        
-    response = {
-        "prediction": prediction,
-        "reason": reason,
-        # Convert NumPy float to standard Python float for JSON serialization
-        "phishing_proba": round(proba, 4)
-    }
-    return jsonify(response)
+        # A rule was triggered, so the URL is PHISHING without consulting the model
+        return jsonify(rule_based_response(reason))
+
+    # --- ML-Based Prediction, answered from the LRU cache for repeated URLs ---
+    try:
+        prediction, proba, reason = _cached_ml_prediction(normalize_url(url))
+    except PredictionError as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify(ml_response(prediction, proba, reason))
+
+@app.route('/cache/clear', methods=['POST'])
+def clear_cache():
+    """
+    Admin endpoint: drops every cached /predict result in this worker process.
+    Requires a JSON body, so a cross-site form POST (which cannot send one without a CORS
+    preflight this API never grants) cannot wipe the cache.
+    """
+    if not request.is_json:
+        return jsonify({"error": "Missing JSON in request"}), 400
+    cleared = _cached_ml_prediction.cache_info().currsize
+    _cached_ml_prediction.cache_clear()
+    return jsonify({"cleared": cleared})
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """API endpoint to receive a list of URLs and return one prediction per URL, in order."""
+
+    if not request.is_json:
+        return jsonify({"error": "Missing JSON in request"}), 400
+
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"error": "JSON body must be an object"}), 400
+    urls = data.get('urls')
+
+    if not isinstance(urls, list) or not urls:
+        return jsonify({"error": "Missing 'urls' list in request"}), 400
+    if len(urls) > MAX_BATCH_URLS:
+        return jsonify({"error": f"Too many URLs in request (max {MAX_BATCH_URLS})"}), 400
+    if not all(isinstance(url, str) and url for url in urls):
+        return jsonify({"error": "Every entry in 'urls' must be a non-empty string"}), 400
+
+    results = [None] * len(urls)
+
+    # --- Step 1: Rule-Based Check per URL, so obvious phishing never reaches the model ---
+    ml_indices = []
+    for i, url in enumerate(urls):
+        is_phishing, reason = rule_based_check(url)
+        if is_phishing:
+            results[i] = rule_based_response(reason)
+        else:
+            ml_indices.append(i)
+
+    # --- Step 2: ONE ML call for every URL that passed the rules ---
+    if ml_indices:
+        try:
+            predictions = ml_batch_prediction([urls[i] for i in ml_indices])
+        except PredictionError as e:
+            return jsonify({"error": str(e)}), 500
+        for i, (prediction, proba, reason) in zip(ml_indices, predictions):
+            results[i] = ml_response(prediction, proba, reason)
+
+    for url, result in zip(urls, results):
+        result["url"] = url
+
+    return jsonify({"results": results})
 
 # --- Startup ---
 if __name__ == '__main__':
@@ -0,0 +1,81 @@
+from joblib import load
+from skl2onnx import convert_sklearn, update_registered_converter
+from skl2onnx.common.data_types import FloatTensorType
+from skl2onnx.operator_converters.random_forest import convert_sklearn_random_forest_classifier
+from skl2onnx.shape_calculators.ensemble_shapes import calculate_tree_classifier_output_shapes
+import json
+import os
+import sys
+
+# Converts the trained scikit-learn model into an ONNX graph so the Flask API can
+# score URLs with ONNX Runtime's native tree-ensemble kernel instead of sklearn's
+# Python-level dispatch. Run after train_model.py:  python backend/export_onnx.py
+
+# --- Configuration ---
+MODEL_DIR = os.path.join('backend', 'models')
+MODEL_FULL_PATH = os.path.join(MODEL_DIR, 'phishing_model.pkl')
+ONNX_FULL_PATH = os.path.join(MODEL_DIR, 'phishing_model.onnx')
+
+def _register_sklearnex_forest(model):
+    """
+    Forests trained with Intel's extension (USE_SKLEARNEX in train_model.py) unpickle as a
+    sklearnex class that skl2onnx does not know. They expose the usual `estimators_`, so that
+    class is registered with skl2onnx's RandomForestClassifier converter. Stock models are left
+    alone (patching sklearn globally would break their conversion instead).
+    """
+    if not type(model).__module__.startswith('sklearnex'):
+        return
+    update_registered_converter(
+        type(model), 'SklearnexRandomForestClassifier',
+        calculate_tree_classifier_output_shapes, convert_sklearn_random_forest_classifier,
+        # The option values skl2onnx registers for its own RandomForestClassifier converter
+        options={
+            'zipmap': [True, False, 'columns'], 'raw_scores': [True, False], 'nocl': [True, False],
+            'output_class_labels': [False, True], 'decision_path': [True, False],
+            'decision_leaf': [True, False],
+        },
+    )
+
+def convert_model_to_onnx(model, n_features, onnx_path, feature_names=None):
+    """
+    Converts a fitted classifier to ONNX and writes it to `onnx_path`.
+    The graph takes a float32 matrix of shape (n_rows, n_features) and returns
+    (labels, probabilities); ZipMap is disabled so probabilities stay a plain tensor.
+    `feature_names` (the input column order) is stored in the model metadata, so the
+    API reads the features from the same file as the model.
+    """
+    _register_sklearnex_forest(model)
+    initial_types = [('X', FloatTensorType([None, n_features]))]
+    onnx_model = convert_sklearn(model, initial_types=initial_types, options={id(model): {'zipmap': False}})
+    if feature_names is not None:
+        entry = onnx_model.metadata_props.add()
+        entry.key = 'feature_names'
+        entry.value = json.dumps(list(feature_names))
+
+    # Written next to the target and renamed over it, so the API never loads a half-written file
+    tmp_path = onnx_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(onnx_model.SerializeToString())
+    os.replace(tmp_path, onnx_path)
+
+if __name__ == '__main__':
+    try:
+        model = load(MODEL_FULL_PATH)
+    except FileNotFoundError:
+        print(f"FATAL ERROR: The file {MODEL_FULL_PATH} was not found. Run train_model.py first.")
+        sys.exit(1)
+
+    # train_model.py saves {'model', 'features', 'schema'}; older versions saved the bare model
+    feature_names = None
+    if isinstance(model, dict):
+        model, feature_names = model['model'], model['features']
+
+    print(f"Converting {MODEL_FULL_PATH} ({model.n_features_in_} features) to ONNX...")
+    try:
+        convert_model_to_onnx(model, model.n_features_in_, ONNX_FULL_PATH, feature_names)
+    except Exception as e:
+        # e.g. an estimator this skl2onnx release has no converter for; the API keeps serving the .pkl
+        details = str(e).splitlines()[0] if str(e) else type(e).__name__
+        print(f"FATAL ERROR: Could not convert {type(model).__name__} to ONNX. Details: {details}")
+        sys.exit(1)
+    print(f"ONNX model saved to {ONNX_FULL_PATH}. Restart the API to use it.")
@@ -1,20 +1,76 @@
 import re
+from socket import inet_aton
 from urllib.parse import urlparse
 
+import numpy as np
+
+from feature_kernels import (
+    NUMBA_AVAILABLE, SENSITIVE_WORDS, COMMON_BRANDS, scan_url,
+    DOTS, DASHES, UNDERSCORES, PERCENTS, DIGITS, AT_SYMBOLS, TILDES, SENSITIVE_WORDS_COUNT, BRAND_MASK,
+)
+
+# Regexes are compiled once at import instead of being looked up on every call
+_SPLIT_RE = re.compile(r'[/.-]')
+_DIGIT_RE = re.compile(r'\d')
+_ASCII_DIGITS = b'0123456789'
+
+# Canonical feature order: the column order of Phishing_Legitimate_full.csv (minus 'id'
+# and 'CLASS_LABEL'), which is the order train_model.py fits the model on.
+# This is the single source of truth for the feature set shared by training and the API.
+FEATURE_NAMES = [
+    'NumDots', 'SubdomainLevel', 'PathLevel', 'UrlLength', 'NumDash', 'NumDashInHostname',
+    'AtSymbol', 'TildeSymbol', 'NumUnderscore', 'NumPercent', 'NumQueryComponents',
+    'NumAmpersand', 'NumHash', 'NumNumericChars', 'NoHttps', 'RandomString', 'IpAddress',
+    'DomainInSubdomains', 'DomainInPaths', 'HttpsInHostname', 'HostnameLength', 'PathLength',
+    'QueryLength', 'DoubleSlashInPath', 'NumSensitiveWords', 'EmbeddedBrandName',
+    'PctExtHyperlinks', 'PctExtResourceUrls', 'ExtFavicon', 'InsecureForms',
+    'RelativeFormAction', 'ExtFormAction', 'AbnormalFormAction', 'PctNullSelfRedirectHyperlinks',
+    'FrequentDomainNameMismatch', 'FakeLinkInStatusBar', 'RightClickDisabled', 'PopUpWindow',
+    'SubmitInfoToEmail', 'IframeOrFrame', 'MissingTitle', 'ImagesOnlyInForm',
+    'SubdomainLevelRT', 'UrlLengthRT', 'PctExtResourceUrlsRT', 'AbnormalExtFormActionR',
+    'ExtMetaScriptLinkRT', 'PctExtNullSelfRedirectHyperlinksRT',
+]
+# Position of every feature in the vector returned by extract_feature_vector()
+_FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+# Positions of the URL-derived features (1-26), written directly by _fill_url_features()
+_IDX_NUM_DOTS = _FEATURE_INDEX['NumDots']
+_IDX_SUBDOMAIN_LEVEL = _FEATURE_INDEX['SubdomainLevel']
+_IDX_PATH_LEVEL = _FEATURE_INDEX['PathLevel']
+_IDX_URL_LENGTH = _FEATURE_INDEX['UrlLength']
+_IDX_NUM_DASH = _FEATURE_INDEX['NumDash']
+_IDX_NUM_DASH_IN_HOSTNAME = _FEATURE_INDEX['NumDashInHostname']
+_IDX_AT_SYMBOL = _FEATURE_INDEX['AtSymbol']
+_IDX_TILDE_SYMBOL = _FEATURE_INDEX['TildeSymbol']
+_IDX_NUM_UNDERSCORE = _FEATURE_INDEX['NumUnderscore']
+_IDX_NUM_PERCENT = _FEATURE_INDEX['NumPercent']
+_IDX_NUM_QUERY_COMPONENTS = _FEATURE_INDEX['NumQueryComponents']
+_IDX_NUM_AMPERSAND = _FEATURE_INDEX['NumAmpersand']
+_IDX_NUM_HASH = _FEATURE_INDEX['NumHash']
+_IDX_NUM_NUMERIC_CHARS = _FEATURE_INDEX['NumNumericChars']
+_IDX_NO_HTTPS = _FEATURE_INDEX['NoHttps']
+_IDX_RANDOM_STRING = _FEATURE_INDEX['RandomString']
+_IDX_IP_ADDRESS = _FEATURE_INDEX['IpAddress']
+_IDX_DOMAIN_IN_SUBDOMAINS = _FEATURE_INDEX['DomainInSubdomains']
+_IDX_DOMAIN_IN_PATHS = _FEATURE_INDEX['DomainInPaths']
+_IDX_HTTPS_IN_HOSTNAME = _FEATURE_INDEX['HttpsInHostname']
+_IDX_HOSTNAME_LENGTH = _FEATURE_INDEX['HostnameLength']
+_IDX_PATH_LENGTH = _FEATURE_INDEX['PathLength']
+_IDX_QUERY_LENGTH = _FEATURE_INDEX['QueryLength']
+_IDX_DOUBLE_SLASH_IN_PATH = _FEATURE_INDEX['DoubleSlashInPath']
+_IDX_NUM_SENSITIVE_WORDS = _FEATURE_INDEX['NumSensitiveWords']
+_IDX_EMBEDDED_BRAND_NAME = _FEATURE_INDEX['EmbeddedBrandName']
+
 # --- Feature Extraction Functions ---
 
 def get_url_length(url):
     """(1) UrlLength: Length of the URL."""
     return len(url)
 
-def get_num_dots(url):
-    """(2) NumDots: Number of dots in the URL."""
-    return url.count('.')
-
-def get_subdomain_level(url):
+def get_subdomain_level(url, parsed):
     """(3) SubdomainLevel: Number of subdomains (counted by dots in hostname - 1)."""
     try:
-        host = urlparse(url).netloc
+        host = parsed.netloc
         if not host:
             return 0
         # Count dots in hostname. Subtract 1 for the TLD dot (e.g., google.com has 1 dot, level 0)
@@ -24,84 +80,100 @@ def get_subdomain_level(url):
     except:
         return 0
 
-def get_path_level(url):
+def get_path_level(url, parsed):
     """(4) PathLevel: Number of directories/slashes in the path."""
     try:
-        path = urlparse(url).path
+        path = parsed.path
         if not path or path == '/':
             return 0
         return path.count('/')
     except:
         return 0
 
-def get_symbol_counts(url):
+def get_symbol_counts(url, parsed):
     """
-    (5-10) Symbol counts based on common phishing features.
-    NumDash, NumDashInHostname, AtSymbol, TildeSymbol, NumUnderscore, NumPercent.
+    (2, 5-10, 14) Character counts based on common phishing features, gathered in one call.
+    NumDots, NumDash, NumDashInHostname, AtSymbol, TildeSymbol, NumUnderscore, NumPercent,
+    NumNumericChars.
     """
-    parsed_url = urlparse(url)
-    host = parsed_url.netloc
-    
+    host = parsed.netloc
+
+    # str.count() is a memchr-speed C scan per symbol, which measured faster than building
+    # a collections.Counter of the whole URL.
     features = {
+        'NumDots': url.count('.'),
         'NumDash': url.count('-'),
         'NumDashInHostname': host.count('-'),
         'AtSymbol': 1 if '@' in url else 0,
         'TildeSymbol': 1 if '~' in url else 0,
         'NumUnderscore': url.count('_'),
         'NumPercent': url.count('%'),
+        'NumNumericChars': count_digits(url),
     }
     return features
 
-def get_query_and_fragment_info(url):
+def count_digits(url):
+    """
+    Number of digit characters in the URL.
+    For ASCII URLs, bytes.translate() deletes the digits in one C loop and the length
+    difference is the count. Other URLs go through str.isdigit, which also counts
+    Unicode digits like the original helper.
+    """
+    if url.isascii():
+        url_bytes = url.encode('ascii')
+        return len(url_bytes) - len(url_bytes.translate(None, _ASCII_DIGITS))
+    return sum(map(str.isdigit, url))
+
+def get_query_and_fragment_info(url, parsed):
     """
     (11-13) Information about query components, ampersands, and hash fragments.
-    NumQueryComponents, NumAmpersand, NumHash.
+    Returns (NumQueryComponents, NumAmpersand, NumHash).
     """
-    parsed_url = urlparse(url)
-    query = parsed_url.query
-    
-    num_query_components = 0
-    if query:
-        # Simple count of key=value pairs separated by '&'
-        num_query_components = len(query.split('&'))
-        
-    features = {
-        'NumQueryComponents': num_query_components,
-        'NumAmpersand': query.count('&'),
-        'NumHash': 1 if parsed_url.fragment else 0,
-    }
-    return features
+    query = parsed.query
+    num_ampersand = query.count('&')
+
+    # Simple count of key=value pairs separated by '&' (same as len(query.split('&')))
+    num_query_components = num_ampersand + 1 if query else 0
 
-def get_num_numeric_chars(url):
-    """(14) NumNumericChars: Count of digits (0-9) in the whole URL."""
-    return sum(c.isdigit() for c in url)
+    return num_query_components, num_ampersand, 1 if parsed.fragment else 0
 
-def check_https(url):
+def check_https(url, parsed):
     """(15) NoHttps: 1 if the scheme is NOT HTTPS, 0 otherwise."""
-    return 1 if urlparse(url).scheme != 'https' else 0
+    return 1 if parsed.scheme != 'https' else 0
 
-def check_random_string(url):
+def check_random_string(url, parsed):
     """(16) RandomString: A simple heuristic for random looking strings (0 or 1)."""
     # This is a highly complex feature to replicate accurately. 
     # Since the original dataset's logic is proprietary, we provide a placeholder.
     # We will use a simple check for very long, non-dictionary-word path segments.
-    parsed_url = urlparse(url)
-    path_segments = parsed_url.path.split('/')
+    path_segments = parsed.path.split('/')
     for segment in path_segments:
-        if len(segment) > 15 and not re.search(r'\d', segment): # Long segment without numbers (could be random characters)
+        if len(segment) > 15 and not _DIGIT_RE.search(segment): # Long segment without numbers (could be random characters)
              return 1
     return 0
 
-def check_ip_address(url):
+def is_ip_address(host):
+    """True if the hostname (port allowed) is a raw IPv4 address (shared with the API's rule-based check)."""
+    host = host.split(':')[0]
+    # inet_aton also accepts short forms ('127.1') and ignores anything after whitespace,
+    # so insist on a plain dotted quad before handing it the string.
+    if host.count('.') != 3 or not host.replace('.', '').isalnum():
+        return False
+    try:
+        # Validating in C also rejects out-of-range octets such as '999.1.1.1'
+        inet_aton(host)
+        return True
+    except (OSError, ValueError):
+        return False
+
+def check_ip_address(url, parsed):
     """(17) IpAddress: 1 if the hostname is an IP address, 0 otherwise."""
-    host = urlparse(url).netloc
-    # Simple regex to check for standard IPv4 format
-    return 1 if re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$", host) else 0
+    return 1 if is_ip_address(parsed.netloc) else 0
 
-def check_domain_in_subdomains(url):
+def check_domain_in_subdomains(url, parsed):
     """(18) DomainInSubdomains: Presence of the TLD-level domain name inside the subdomain."""
     try:
-        host = urlparse(url).netloc
+        host = parsed.netloc
         domain_parts = host.split('.')
         if len(domain_parts) >= 3:
             # Simple check: if the name before the TLD appears in the subdomains
@@ -112,12 +184,11 @@ def check_domain_in_subdomains(url):
     except:
         return 0
 
-def check_domain_in_paths(url):
+def check_domain_in_paths(url, parsed):
     """(19) DomainInPaths: Presence of the TLD-level domain name inside the path."""
     try:
-        parsed_url = urlparse(url)
-        host = parsed_url.netloc
-        path = parsed_url.path
+        host = parsed.netloc
+        path = parsed.path
         
         # Simple extraction of the base domain name (e.g., 'google' from 'www.google.com')
         domain_parts = host.split('.')
@@ -127,46 +198,80 @@ def check_domain_in_paths(url):
     except:
         return 0
 
-def check_https_in_hostname(url):
+def check_https_in_hostname(url, parsed):
     """(20) HttpsInHostname: 1 if 'https' is present in the hostname as a string."""
-    host = urlparse(url).netloc
-    return 1 if 'https' in host.lower() else 0
+    return 1 if 'https' in parsed.netloc.lower() else 0
 
-def get_hostname_length(url):
+def get_hostname_length(url, parsed):
     """(21) HostnameLength: Length of the hostname component."""
-    return len(urlparse(url).netloc)
+    return len(parsed.netloc)
 
-def get_path_length(url):
+def get_path_length(url, parsed):
     """(22) PathLength: Length of the path component."""
-    return len(urlparse(url).path)
+    return len(parsed.path)
 
-def get_query_length(url):
+def get_query_length(url, parsed):
     """(23) QueryLength: Length of the query string component."""
-    return len(urlparse(url).query)
+    return len(parsed.query)
 
-def get_double_slash_in_path(url):
+def get_double_slash_in_path(url, parsed):
     """(24) DoubleSlashInPath: 1 if '//' appears in the path, 0 otherwise."""
-    return 1 if '//' in urlparse(url).path else 0
+    return 1 if '//' in parsed.path else 0
 
-def get_num_sensitive_words(url):
+def get_num_sensitive_words(url, url_lower):
     """(25) NumSensitiveWords: Count of common sensitive words (login, banking, paypal, etc.) in the URL."""
-    sensitive_words = ['login', 'verify', 'update', 'account', 'bank', 'secure', 'paypal', 'amazon', 'ebay', 'signin']
-    url_lower = url.lower()
-    return sum(url_lower.count(word) for word in sensitive_words)
+    return sum(url_lower.count(word) for word in SENSITIVE_WORDS)
 
-def check_embedded_brand_name(url):
-    """(26) EmbeddedBrandName: Heuristic for brand name spoofing (e.g., 'microsoft' in path)."""
+def fill_scanned_counts(url, parsed, url_lower, vector):
+    """
+    (2, 5-10, 14, 25, 26) Character, keyword and brand-name features over the whole URL,
+    written straight into their FEATURE_NAMES positions of `vector`.
+    Uses the single-pass compiled kernel (feature_kernels.py) when Numba is installed.
+    Non-ASCII URLs keep the str-based helpers, since Unicode digits and case folding
+    would be lost when the URL is reduced to ASCII bytes.
+    """
+    if not (NUMBA_AVAILABLE and url.isascii()):
+        for name, value in get_symbol_counts(url, parsed).items():
+            vector[_FEATURE_INDEX[name]] = value
+        vector[_IDX_NUM_SENSITIVE_WORDS] = get_num_sensitive_words(url, url_lower)
+        vector[_IDX_EMBEDDED_BRAND_NAME] = check_embedded_brand_name(url, parsed, url_lower)
+        return
+
+    counts = scan_url(url)
+    brand_mask = int(counts[BRAND_MASK])
+    brands_found = [brand for i, brand in enumerate(COMMON_BRANDS) if brand_mask >> i & 1]
+    vector[_IDX_NUM_DASH] = counts[DASHES]
+    vector[_IDX_NUM_DASH_IN_HOSTNAME] = parsed.netloc.count('-')
+    vector[_IDX_AT_SYMBOL] = 1 if counts[AT_SYMBOLS] else 0
+    vector[_IDX_TILDE_SYMBOL] = 1 if counts[TILDES] else 0
+    vector[_IDX_NUM_UNDERSCORE] = counts[UNDERSCORES]
+    vector[_IDX_NUM_PERCENT] = counts[PERCENTS]
+    vector[_IDX_NUM_DOTS] = counts[DOTS]
+    vector[_IDX_NUM_NUMERIC_CHARS] = counts[DIGITS]
+    vector[_IDX_NUM_SENSITIVE_WORDS] = counts[SENSITIVE_WORDS_COUNT]
+    vector[_IDX_EMBEDDED_BRAND_NAME] = check_embedded_brand_name(url, parsed, url_lower, brands_found)
+
+def check_embedded_brand_name(url, parsed, url_lower, brands_found=None):
+    """
+    (26) EmbeddedBrandName: Heuristic for brand name spoofing (e.g., 'microsoft' in path).
+    `brands_found` are the brands occurring in the URL, if the caller already scanned for them.
+    """
     # Since we cannot replicate the full list, we check for a brand name 
     # followed by a dash or dot, or in the path/subdomain, not just the main domain.
-    common_brands = ['paypal', 'google', 'amazon', 'microsoft', 'apple']
-    url_parts = re.split(r'[/.-]', url.lower())
-    
-    for brand in common_brands:
+    if brands_found is None:
+        brands_found = [brand for brand in COMMON_BRANDS if brand in url_lower]
+
+    # Check if the brand appears *outside* the primary domain name component.
+    # Only such brands can match, so most URLs skip the tokenizing split entirely.
+    host = parsed.netloc
+    candidates = [brand for brand in brands_found if brand not in host]
+    if not candidates:
+        return 0
+
+    url_parts = _SPLIT_RE.split(url_lower)
+    for brand in candidates:
         if brand in url_parts:
-            # Check if the brand appears *outside* the primary domain name component
-            host = urlparse(url).netloc
-            if brand not in host and brand in url.lower():
-                return 1
+            return 1
     return 0
 
 # --- Placeholders for Advanced RT Features (Requires Document/External Analysis) ---
@@ -225,59 +330,76 @@ def get_realtime_features():
     }
     return features
 
+def _build_placeholder_vector():
+    """FEATURE_NAMES-ordered vector with the page-content placeholders (27-48) already filled in."""
+    vector = np.zeros(len(FEATURE_NAMES), dtype=np.int32)
+    for name, value in {**get_content_based_features(), **get_realtime_features()}.items():
+        vector[_FEATURE_INDEX[name]] = value
+    return vector
+
+# The placeholders never change, so every extracted vector starts as a copy of this one
+_PLACEHOLDER_VECTOR = _build_placeholder_vector()
 
 # --- Main Feature Extraction Function ---
 
+def _fill_url_features(url, vector):
+    """Computes the 26 URL-derived features (1-26) and writes them into their `vector` positions."""
+
+    # 1. Parse the URL once and share the result with every helper below
+    parsed = urlparse(url)
+    url_lower = url.lower()
+
+    # 2. Add simple structural features (1, 3, 4, 15, 21-24)
+    vector[_IDX_URL_LENGTH] = get_url_length(url)
+    vector[_IDX_SUBDOMAIN_LEVEL] = get_subdomain_level(url, parsed)
+    vector[_IDX_PATH_LEVEL] = get_path_level(url, parsed)
+    vector[_IDX_NO_HTTPS] = check_https(url, parsed)
+    vector[_IDX_HOSTNAME_LENGTH] = get_hostname_length(url, parsed)
+    vector[_IDX_PATH_LENGTH] = get_path_length(url, parsed)
+    vector[_IDX_QUERY_LENGTH] = get_query_length(url, parsed)
+    vector[_IDX_DOUBLE_SLASH_IN_PATH] = get_double_slash_in_path(url, parsed)
+
+    # 3. Add character/keyword/brand features (2, 5-10, 14, 25, 26) from a single scan of the URL
+    fill_scanned_counts(url, parsed, url_lower, vector)
+
+    # 4. Add query/fragment features (11-13)
+    (vector[_IDX_NUM_QUERY_COMPONENTS],
+     vector[_IDX_NUM_AMPERSAND],
+     vector[_IDX_NUM_HASH]) = get_query_and_fragment_info(url, parsed)
+
+    # 5. Add complex structural checks (16-20)
+    vector[_IDX_RANDOM_STRING] = check_random_string(url, parsed)
+    vector[_IDX_IP_ADDRESS] = check_ip_address(url, parsed)
+    vector[_IDX_DOMAIN_IN_SUBDOMAINS] = check_domain_in_subdomains(url, parsed)
+    vector[_IDX_DOMAIN_IN_PATHS] = check_domain_in_paths(url, parsed)
+    vector[_IDX_HTTPS_IN_HOSTNAME] = check_https_in_hostname(url, parsed)
+
+def extract_feature_vector(url):
+    """
+    Extracts all 48 features required by the ML model, directly in model input order.
+    Every feature is an integer, so the vector is int32; callers cast it to the model's
+    input dtype once (e.g. when copying it into a float32 batch matrix).
+
+    Returns:
+        np.ndarray: int32 vector of shape (48,), ordered like FEATURE_NAMES.
+    """
+    vector = _PLACEHOLDER_VECTOR.copy()
+    _fill_url_features(url, vector)
+    return vector
+
 def extract_features_from_url(url):
     """
-    Extracts all 48 features required by the ML model from a single URL string.
+    Extracts all 48 features (FEATURE_NAMES) required by the ML model from a single URL string.
+    The API uses extract_feature_vector(); this dict form is kept for inspection and debugging.
     
     Returns:
         dict: A dictionary mapping feature names (matching the CSV headers) 
               to their extracted or placeholder values.
     """
-    
-    # 1. Initialize master features dictionary
-    features = {}
-
-    # 2. Add simple structural features (1-4, 14, 15, 21-24)
-    features['UrlLength'] = get_url_length(url)
-    features['NumDots'] = get_num_dots(url)
-    features['SubdomainLevel'] = get_subdomain_level(url)
-    features['PathLevel'] = get_path_level(url)
-    features['NumNumericChars'] = get_num_numeric_chars(url)
-    features['NoHttps'] = check_https(url)
-    features['HostnameLength'] = get_hostname_length(url)
-    features['PathLength'] = get_path_length(url)
-    features['QueryLength'] = get_query_length(url)
-    features['DoubleSlashInPath'] = get_double_slash_in_path(url)
-    
-    # 3. Add symbol-based features (5-10)
-    features.update(get_symbol_counts(url))
-    
-    # 4. Add query/fragment features (11-13)
-    features.update(get_query_and_fragment_info(url))
-
-    # 5. Add complex structural checks (16-20, 25, 26)
-    features['RandomString'] = check_random_string(url)
-    features['IpAddress'] = check_ip_address(url)
-    features['DomainInSubdomains'] = check_domain_in_subdomains(url)
-    features['DomainInPaths'] = check_domain_in_paths(url)
-    features['HttpsInHostname'] = check_https_in_hostname(url)
-    features['NumSensitiveWords'] = get_num_sensitive_words(url)
-    features['EmbeddedBrandName'] = check_embedded_brand_name(url)
-    
-    # 6. Add PLACEHOLDERS for page-content-based features (27-48)
-    # The model expects these features, so they must be present, even if we can't 
-    # calculate them from the URL string alone.
-    features.update(get_content_based_features())
-    features.update(get_realtime_features())
-    
-    # Verification (should always be 48 features)
-    if len(features) != 48:
-        print(f"WARNING: Feature extraction resulted in {len(features)} features, expected 48.")
-        
-    return features
+    # URL-derived features (1-26) followed by the PLACEHOLDERS for page-content-based
+    # features (27-48). The model expects these features, so they must be present, even
+    # if we can't calculate them from the URL string alone.
+    return dict(zip(FEATURE_NAMES, extract_feature_vector(url).tolist()))
 
 # Example usage (for local testing):
 if __name__ == '__main__':
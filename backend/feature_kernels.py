@@ -0,0 +1,129 @@
+from collections import deque
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    # Numba is optional: feature_extraction.py falls back to the plain
+    # Python helpers when the compiled kernel is not available.
+    njit = None
+    NUMBA_AVAILABLE = False
+
+# --- Compiled URL Scanning Kernel ---
+# The character-count features (dots, dashes, digits, ...), the sensitive keyword
+# count and the brand-name lookup used to be ~20 separate passes over the URL string.
+# scan_url() walks the raw URL bytes ONCE and fills every counter in that pass.
+
+SENSITIVE_WORDS = ['login', 'verify', 'update', 'account', 'bank', 'secure', 'paypal', 'amazon', 'ebay', 'signin']
+COMMON_BRANDS = ['paypal', 'google', 'amazon', 'microsoft', 'apple']
+
+# Slots of the vector returned by scan_url()
+DOTS = 0
+DASHES = 1
+UNDERSCORES = 2
+PERCENTS = 3
+DIGITS = 4
+AT_SYMBOLS = 5
+TILDES = 6
+SENSITIVE_WORDS_COUNT = 7
+BRAND_MASK = 8 # Bit i is set when COMMON_BRANDS[i] occurs anywhere in the URL
+_OTHER = 9 # Sink slot for bytes we do not care about (never read)
+N_COUNTS = 10
+
+def _build_char_classes():
+    """Maps every byte value to the counter slot it increments (branchless lookup)."""
+    classes = np.full(256, _OTHER, dtype=np.int32)
+    classes[ord('.')] = DOTS
+    classes[ord('-')] = DASHES
+    classes[ord('_')] = UNDERSCORES
+    classes[ord('%')] = PERCENTS
+    classes[ord('0'):ord('9') + 1] = DIGITS
+    classes[ord('@')] = AT_SYMBOLS
+    classes[ord('~')] = TILDES
+    return classes
+
+def _build_keyword_automaton(sensitive_words, brands):
+    """
+    Builds one Aho-Corasick automaton for the sensitive words and brand names as a dense DFA.
+
+    Returns (transitions, matches, brand_bits): transitions[state, byte] is the next state,
+    matches[state] is the number of sensitive words that end in that state and brand_bits[state]
+    has bit i set if brands[i] ends there. Upper-case ASCII columns mirror the lower-case
+    ones, so the scan is case-insensitive without lowering the URL first.
+    """
+    goto = [{}]
+    matches = [0]
+    brand_bits = [0]
+
+    def insert(word):
+        state = 0
+        for byte in word.encode('ascii'):
+            if byte not in goto[state]:
+                goto.append({})
+                matches.append(0)
+                brand_bits.append(0)
+                goto[state][byte] = len(goto) - 1
+            state = goto[state][byte]
+        return state
+
+    for word in sensitive_words:
+        matches[insert(word)] += 1
+    for i, brand in enumerate(brands):
+        brand_bits[insert(brand)] |= 1 << i
+
+    transitions = np.zeros((len(goto), 256), dtype=np.int32)
+    fail = [0] * len(goto)
+    queue = deque()
+    for byte, nxt in goto[0].items():
+        transitions[0, byte] = nxt
+        queue.append(nxt)
+
+    # Breadth-first, so a state's failure target is always finished before it
+    while queue:
+        state = queue.popleft()
+        matches[state] += matches[fail[state]]
+        brand_bits[state] |= brand_bits[fail[state]]
+        transitions[state] = transitions[fail[state]]
+        for byte, nxt in goto[state].items():
+            transitions[state, byte] = nxt
+            fail[nxt] = transitions[fail[state], byte]
+            queue.append(nxt)
+
+    transitions[:, ord('A'):ord('Z') + 1] = transitions[:, ord('a'):ord('z') + 1]
+    return transitions, np.asarray(matches, dtype=np.int32), np.asarray(brand_bits, dtype=np.int32)
+
+_CHAR_CLASSES = _build_char_classes()
+# NOTE: None of the sensitive words overlaps with itself, so the automaton's
+# (overlapping) match count equals the old sum of str.count() results.
+_KEYWORD_TRANSITIONS, _KEYWORD_MATCHES, _BRAND_BITS = _build_keyword_automaton(SENSITIVE_WORDS, COMMON_BRANDS)
+
+def _scan_bytes(buf, char_classes, transitions, matches, brand_bits):
+    """Single pass over the URL bytes, tallying every counter slot."""
+    counts = np.zeros(N_COUNTS, dtype=np.int32)
+    state = 0
+    for i in range(buf.shape[0]):
+        byte = buf[i]
+        counts[char_classes[byte]] += 1
+        state = transitions[state, byte]
+        counts[SENSITIVE_WORDS_COUNT] += matches[state]
+        counts[BRAND_MASK] |= brand_bits[state]
+    return counts
+
+if NUMBA_AVAILABLE:
+    _scan_bytes = njit(cache=True)(_scan_bytes)
+
+def scan_url(url):
+    """
+    Runs the scanning kernel over an ASCII URL.
+
+    Returns:
+        np.ndarray: int32 vector indexed by the slot constants above (DOTS, DIGITS, ...).
+    """
+    buf = np.frombuffer(url.encode('ascii', 'ignore'), dtype=np.uint8)
+    return _scan_bytes(buf, _CHAR_CLASSES, _KEYWORD_TRANSITIONS, _KEYWORD_MATCHES, _BRAND_BITS)
+
+# Warm up the JIT at import time so the first /predict request does not pay the compile cost
+if NUMBA_AVAILABLE:
+    scan_url("http://warm-up.example.com/login?a=1")
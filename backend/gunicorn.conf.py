@@ -0,0 +1,28 @@
+# Gunicorn configuration for the Phishing URL Detector API.
+# Run from the project root (model paths are relative to it):
+#   gunicorn -c backend/gunicorn.conf.py
+
+import multiprocessing
+
+pythonpath = 'backend'
+wsgi_app = 'app:app'
+bind = '127.0.0.1:5000'
+
+# Import the app (and load the model) once in the master process; forked workers
+# then share the unpickled model copy-on-write instead of each loading their own.
+preload_app = True
+
+# Threaded workers: predict_proba releases the GIL inside sklearn's Cython tree code,
+# so threads overlap real work (and feed the micro-batcher) instead of blocking per request.
+workers = 2 * multiprocessing.cpu_count() + 1
+worker_class = 'gthread'
+threads = 8
+
+def when_ready(server):
+    """Loads the ML resources in the master before any worker is forked."""
+    import app
+
+    app.load_ml_resources()
+    if not (app.model and app.feature_names):
+        server.log.error("FATAL: Server startup failed due to missing ML resources.")
+        raise SystemExit(1)
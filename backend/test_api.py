@@ -1,46 +1,111 @@
-import requests
-import json
+import asyncio
+import httpx
+import orjson
 
-# Define the URL for the Flask API's prediction endpoint
+# Define the URLs for the Flask API's prediction endpoints
 API_URL = "http://127.0.0.1:5000/predict"
+BATCH_API_URL = "http://127.0.0.1:5000/predict_batch"
+MAX_CONNECTIONS = 8 # Single-URL requests in flight at once
+TIMEOUT_SECONDS = 5
 
-def test_url(url):
+def make_client():
     """
-    Sends a single URL to the Flask API and prints the response.
+    One async client for the whole run: every test reuses a pooled keep-alive connection
+    instead of opening (and tearing down) a new one per request.
+    """
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+    return httpx.AsyncClient(
+        headers={"Content-Type": "application/json"}, limits=limits, timeout=TIMEOUT_SECONDS
+    )
+
+def print_result(url, data):
+    """Prints the prediction fields of one API result."""
+    prediction = data.get("prediction", "N/A")
+    reason = data.get("reason", "No reason provided")
+    
+    phishing_proba = data.get("phishing_proba")
+    proba_str = f" (P={phishing_proba})" if phishing_proba else ""
+    
+    print(f"URL: {url}")
+    print(f" -> RESULT: {prediction.upper()}{proba_str}")
+    print(f" -> REASON: {reason}\n")
+
+def print_connection_error(api_url):
+    print("--------------------------------------------------")
+    print(f"ERROR: Could not connect to the API at {api_url}.")
+    print("Please ensure your Flask app ('python backend/app.py') is running.")
+    print("--------------------------------------------------\n")
+
+async def test_url(client, url):
+    """
+    Sends a single URL to the Flask API and returns the outcome as a dict:
+    {"url", "data"} on success, or {"url", "error", ...} if the request failed.
+    Nothing is printed here, so several calls can run concurrently.
     """
     payload = {"url": url}
-    headers = {"Content-Type": "application/json"}
     
     try:
         # Send the POST request to the API
-        response = requests.post(API_URL, headers=headers, data=json.dumps(payload))
+        response = await client.post(API_URL, content=orjson.dumps(payload))
         response.raise_for_status() # Raise an exception for HTTP error codes
         
         # Parse the JSON response
-        data = response.json()
+        return {"url": url, "data": orjson.loads(response.content)}
         
+    except httpx.ConnectError:
+        return {"url": url, "error": "connection"}
+    except Exception as e:
+        return {
+            "url": url,
+            "error": str(e),
+            "status": response.status_code if 'response' in locals() else 'N/A',
+            "content": response.text if 'response' in locals() else 'N/A',
+        }
+
+def report(result):
+    """Prints one test_url() outcome."""
+    if "data" in result:
         # Extract and print the relevant prediction fields
-        prediction = data.get("prediction", "N/A")
-        reason = data.get("reason", "No reason provided")
-        
-        phishing_proba = data.get("phishing_proba")
-        proba_str = f" (P={phishing_proba})" if phishing_proba else ""
-        
-        print(f"URL: {url}")
-        print(f" -> RESULT: {prediction.upper()}{proba_str}")
-        print(f" -> REASON: {reason}\n")
-        
-    except requests.exceptions.ConnectionError:
-        print("--------------------------------------------------")
-        print(f"ERROR: Could not connect to the API at {API_URL}.")
-        print("Please ensure your Flask app ('python backend/app.py') is running.")
-        print("--------------------------------------------------\n")
-        return
+        print_result(result["url"], result["data"])
+    elif result["error"] == "connection":
+        print_connection_error(API_URL)
+    else:
+        print(f"An unexpected error occurred for URL {result['url']}: {result['error']}")
+        print(f"Full response status: {result['status']}")
+        print(f"Full response content: {result['content']}\n")
+
+async def test_batch(client, urls):
+    """
+    Sends every URL to the batch endpoint in ONE request and prints each result.
+    The API scores all URLs that pass the rule-based checks in a single model call.
+    """
+    payload = {"urls": urls}
+
+    try:
+        response = await client.post(BATCH_API_URL, content=orjson.dumps(payload))
+        response.raise_for_status()
+
+        for result in orjson.loads(response.content)["results"]:
+            print_result(result["url"], result)
+
+    except httpx.ConnectError:
+        print_connection_error(BATCH_API_URL)
     except Exception as e:
-        print(f"An unexpected error occurred for URL {url}: {e}")
+        print(f"An unexpected error occurred for the batch request: {e}")
         print(f"Full response status: {response.status_code if 'response' in locals() else 'N/A'}")
         print(f"Full response content: {response.text if 'response' in locals() else 'N/A'}\n")
 
+async def run_tests(test_cases):
+    """Runs the single-URL tests concurrently, then the batch endpoint test."""
+    async with make_client() as client:
+        # The single-URL requests are all in flight at once on the event loop; the results
+        # are printed afterwards in test-case order
+        results = await asyncio.gather(*(test_url(client, case) for case in test_cases))
+        for result in results:
+            report(result)
+
+        print("--- Running Batch Endpoint Test ---")
+        await test_batch(client, test_cases)
 
 if __name__ == "__main__":
     
@@ -67,7 +132,6 @@ if __name__ == "__main__":
     print("--- Running Phishing Detector API Tests ---")
     
     # Run the tests
-    for case in test_cases:
-        test_url(case)
+    asyncio.run(run_tests(test_cases))
 
     print("--- Testing Complete ---")
@@ -1,92 +1,342 @@
+import os
+import platform
+
+# Thread pools are sized when NumPy/scikit-learn are first imported, so this must run first.
+# Trees are built in parallel by joblib (n_jobs=-1) and OpenMP; BLAS is kept single-threaded
+# so it does not oversubscribe the cores those workers already use.
+os.environ.setdefault('OMP_NUM_THREADS', str(os.cpu_count()))
+os.environ.setdefault('OPENBLAS_NUM_THREADS', '1')
+
+# Opt-in: on x86, let Intel's Extension for Scikit-learn (pip install scikit-learn-intelex) fit
+# the RandomForest with oneDAL's vectorized tree builder (~3-4x faster). It has to patch sklearn
+# before the estimator is imported. Off by default because the result is a different model:
+# oneDAL's forest scores with its own predict_proba, while its exported trees (and so the ONNX
+# graph the API prefers) carry one-hot leaves, i.e. a hard-voting forest. The pickled model is
+# also a sklearnex class, so the API then needs the package to load the .pkl.
+USE_SKLEARNEX = False
+if USE_SKLEARNEX and platform.machine() in ('x86_64', 'AMD64'):
+    try:
+        from sklearnex import patch_sklearn
+        patch_sklearn(name='sklearn.ensemble.RandomForestClassifier')
+    except (ImportError, ValueError):
+        # Not installed, or a release without this patch: train with stock scikit-learn
+        USE_SKLEARNEX = False
+else:
+    USE_SKLEARNEX = False
+
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 from joblib import dump
-import os
 import sys
-import json # New import for saving feature list
+from pathlib import Path
+
+# The canonical feature list shared with the Flask API
+from feature_extraction import FEATURE_NAMES
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:
+    # pyarrow is optional; without it the CSV is parsed by pandas' (single-threaded) C reader
+    pa = None
+
+try:
+    import lz4.frame # noqa: F401 (only needed for MODEL_COMPRESSION = ('lz4', level))
+    LZ4_AVAILABLE = True
+except ImportError:
+    LZ4_AVAILABLE = False
+
+try:
+    from export_onnx import convert_model_to_onnx
+except ImportError:
+    # skl2onnx is optional; without it only the pickle is written (run export_onnx.py later)
+    convert_model_to_onnx = None
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    # Optional; without it the exported graph is not checked against the trained model
+    ort = None
 
 # NOTE: Since the new user-provided dataset ('Phishing_Legitimate_full.csv') 
 # already contains pre-calculated features, we will skip the feature extraction 
-# loop and use the columns directly. The original feature_extraction.py is 
-# now only necessary for the Flask API to process new, single URLs.
+# loop and use the columns directly. feature_extraction.py is only used here for
+# FEATURE_NAMES, so the model is trained on exactly the columns the API extracts.
 
 # --- Configuration ---
 # Update this path to your uploaded filedata/Phishing_Legitimate_full.csv
 DATASET_PATH = r'G:\Phishing-URL-Detector\backend\data\Phishing_Legitimate_full.csv' 
 MODEL_DIR = 'models'
 MODEL_FILENAME = 'phishing_model.pkl'
-FEATURES_FILENAME = 'feature_metadata.json' # New file for feature names
+ONNX_FILENAME = 'phishing_model.onnx' # Served by the API with ONNX Runtime when present
+# 'random_forest' (default, exported to ONNX) or 'hist_gradient_boosting' (binned gradient
+# boosting: ~8x faster than the forest when the API serves the pickle through scikit-learn)
+MODEL_TYPE = 'random_forest'
+# joblib compression of the pickle. 0 (default) keeps it memory-mappable by the API; a tuple
+# such as ('lz4', 3) gives a smaller file at the cost of decompressing it into every worker
+# (falls back to zlib when the lz4 package is not installed).
+MODEL_COMPRESSION = 0
+# Version of the {'model', 'features', 'schema'} bundle saved to MODEL_FULL_PATH (checked by app.py)
+MODEL_BUNDLE_SCHEMA = 1
+# Cap on training rows kept per class. None (default) loads the whole dataset at once; an int
+# streams the CSV in CSV_CHUNK_ROWS chunks and keeps a uniform random sample (seeded, so
+# reproducible) of at most this many rows per class, bounding memory for very large datasets.
+MAX_ROWS_PER_CLASS = None
+CSV_CHUNK_ROWS = 200_000
+# Largest difference in phishing probability (on the test split) tolerated between the trained
+# model and its ONNX export; a larger one means the API would serve a different model
+ONNX_MAX_PROBA_DIFF = 1e-4
 
-# Create the model directory if it doesn't exist
-os.makedirs(os.path.join('backend', MODEL_DIR), exist_ok=True)
 MODEL_FULL_PATH = os.path.join('backend', MODEL_DIR, MODEL_FILENAME)
-FEATURES_FULL_PATH = os.path.join('backend', MODEL_DIR, FEATURES_FILENAME) # Full path for new file
+
+# Only these columns are parsed from the CSV ('id' and any extra columns are skipped),
+# straight into the dtypes used for training
+TARGET_COLUMN = 'CLASS_LABEL'
+CSV_COLUMNS = [*FEATURE_NAMES, TARGET_COLUMN]
+CSV_DTYPES = {**{name: 'float32' for name in FEATURE_NAMES}, TARGET_COLUMN: 'int8'}
+ONNX_FULL_PATH = os.path.join('backend', MODEL_DIR, ONNX_FILENAME)
+
+def _read_parquet_cache(cache_path, csv_path, schema):
+    """Returns the cached Arrow table, or None if the cache is missing, stale or has other columns."""
+    try:
+        if os.path.getmtime(cache_path) < os.path.getmtime(csv_path):
+            return None
+    except FileNotFoundError:
+        # No cache yet (a missing CSV is reported when load_dataset() parses it)
+        return None
+    try:
+        table = pq.read_table(cache_path, columns=CSV_COLUMNS)
+    except (OSError, pa.ArrowInvalid):
+        # Corrupt/partially written file, or the feature set changed since it was written
+        return None
+    return table if table.schema.equals(schema) else None
+
+def load_dataset(path):
+    """
+    Reads the CSV_COLUMNS of the dataset into a DataFrame with the CSV_DTYPES.
+    Uses PyArrow's multithreaded CSV reader when available, pandas' reader otherwise.
+
+    With PyArrow, the parsed columns are also cached in a Parquet file next to the CSV
+    (same name, .parquet extension); later runs read that instead of re-parsing the CSV,
+    until the CSV is modified again.
+    """
+    if pa is None:
+        return pd.read_csv(path, usecols=CSV_COLUMNS, dtype=CSV_DTYPES)
+
+    schema = pa.schema([(name, pa.from_numpy_dtype(np.dtype(CSV_DTYPES[name]))) for name in CSV_COLUMNS])
+    cache_path = os.path.splitext(path)[0] + '.parquet'
+
+    table = _read_parquet_cache(cache_path, path, schema)
+    if table is not None:
+        print(f"Using cached dataset {cache_path}")
+    else:
+        convert_options = pacsv.ConvertOptions(include_columns=CSV_COLUMNS, column_types=schema)
+        table = pacsv.read_csv(path, convert_options=convert_options)
+        try:
+            pq.write_table(table, cache_path, compression='zstd')
+        except OSError as e:
+            print(f"WARNING: Could not write the dataset cache {cache_path}: {e}")
+
+    # self_destruct frees each Arrow column as soon as it has been converted
+    return table.to_pandas(self_destruct=True)
+
+def sample_dataset(path, max_rows_per_class, chunk_rows=CSV_CHUNK_ROWS, seed=42):
+    """
+    Streams the dataset in chunks and reservoir-samples up to `max_rows_per_class` rows of
+    each class into preallocated float32 buffers, so memory never holds more than one chunk
+    plus the samples.
+
+    Returns:
+        (X, y): float32 feature matrix in FEATURE_NAMES order and the int8 labels.
+    """
+    rng = np.random.default_rng(seed)
+    reservoirs = {} # label -> [sample buffer, rows of that class seen so far]
+
+    for chunk in pd.read_csv(path, usecols=CSV_COLUMNS, dtype=CSV_DTYPES, chunksize=chunk_rows):
+        features = chunk[FEATURE_NAMES].to_numpy(dtype=np.float32)
+        labels = chunk[TARGET_COLUMN].to_numpy()
+        for label in np.unique(labels):
+            rows = features[labels == label]
+            if label not in reservoirs:
+                reservoirs[label] = [np.empty((max_rows_per_class, len(FEATURE_NAMES)), dtype=np.float32), 0]
+            buffer, seen = reservoirs[label]
+
+            # Reservoir sampling (Algorithm R), vectorized over the chunk: the class's t-th row
+            # (0-based) fills slot t while the buffer is not full, and afterwards replaces a
+            # random slot with probability max_rows_per_class / (t + 1)
+            t = seen + np.arange(len(rows))
+            filling = t < max_rows_per_class
+            buffer[t[filling]] = rows[filling]
+            slots = rng.integers(0, t[~filling] + 1)
+            replace = slots < max_rows_per_class
+            candidates = rows[~filling][replace]
+            slots = slots[replace]
+            # When several rows draw the same slot, the last one wins as in the sequential
+            # algorithm. NumPy does not define the order of repeated-index assignment, so keep
+            # only the last occurrence of each slot (first occurrence in the reversed array).
+            slots, last = np.unique(slots[::-1], return_index=True)
+            buffer[slots] = candidates[::-1][last]
+            reservoirs[label][1] = seen + len(rows)
+
+    kept = {label: min(seen, max_rows_per_class) for label, (_, seen) in reservoirs.items()}
+    X = np.concatenate([reservoirs[label][0][:kept[label]] for label in sorted(kept)])
+    y = np.concatenate([np.full(kept[label], label, dtype=np.int8) for label in sorted(kept)])
+    for label in sorted(kept):
+        print(f"Class {label}: sampled {kept[label]} of {reservoirs[label][1]} rows")
+    return X, y
+
+def build_model(model_type=MODEL_TYPE):
+    """Returns the untrained classifier selected by MODEL_TYPE."""
+    if model_type == 'random_forest':
+        # n_jobs=-1 fits the trees in parallel on every core (the fitted model is unchanged).
+        # min_samples_leaf and max_samples (each tree bootstraps half of the rows) keep the
+        # trees small: prediction walks every tree, and the pickle size follows the node count.
+        return RandomForestClassifier(
+            n_estimators=100, max_depth=12, min_samples_leaf=5, max_samples=0.5,
+            random_state=42, n_jobs=-1,
+        )
+    if model_type == 'hist_gradient_boosting':
+        return HistGradientBoostingClassifier(max_iter=100, max_depth=10, random_state=42)
+    raise ValueError(f"Unknown MODEL_TYPE '{model_type}' (expected 'random_forest' or 'hist_gradient_boosting')")
+
+def onnx_max_proba_diff(model, onnx_path, X):
+    """Largest absolute difference between the model's and the ONNX graph's probabilities on X."""
+    session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+    onnx_proba = session.run(None, {session.get_inputs()[0].name: X})[1]
+    return float(np.abs(onnx_proba - model.predict_proba(X)).max())
+
+def prepare_model_dir(model_path):
+    """
+    Creates the directory the model is saved to and checks that it is writable, so a
+    misconfigured path fails in seconds instead of after the whole fit.
+    """
+    model_dir = Path(model_path).parent
+    model_dir.mkdir(parents=True, exist_ok=True)
+    if not os.access(model_dir, os.W_OK):
+        raise PermissionError(f"Model directory {model_dir} is not writable")
 
 def train_and_save_model():
     """
-    Loads pre-processed data from the CSV, trains a RandomForest model, 
-    and saves the model and the feature list to a .pkl and .json file, respectively.
+    Loads pre-processed data from the CSV, trains the MODEL_TYPE classifier, 
+    and saves the model together with its feature list to a single .pkl bundle.
     """
+    try:
+        prepare_model_dir(MODEL_FULL_PATH)
+    except OSError as e:
+        print(f"FATAL ERROR: Cannot save the model to {MODEL_FULL_PATH}. Error: {e}")
+        sys.exit(1)
+
     print(f"Loading data from {DATASET_PATH}...")
     try:
-        # Load the CSV file
-        df = pd.read_csv(DATASET_PATH)
+        if MAX_ROWS_PER_CLASS is not None:
+            # Large dataset: stream it and keep a bounded random sample of each class
+            X, y = sample_dataset(DATASET_PATH, MAX_ROWS_PER_CLASS)
+        else:
+            # Load the feature and label columns of the CSV file
+            df = load_dataset(DATASET_PATH)
 
-        # The 'id' column and the target column should be excluded from features (X)
-        # The target variable is identified as 'CLASS_LABEL' from the CSV header.
-        
-        # Define features (X) by dropping non-feature columns
-        # We drop 'id' and the target column 'CLASS_LABEL'
-        X = df.drop(columns=['id', 'CLASS_LABEL']) 
-        
-        # Define target variable (y)
-        y = df['CLASS_LABEL']
+            # The 'id' column and the target column should be excluded from features (X)
+            # The target variable is identified as 'CLASS_LABEL' from the CSV header.
+            
+            # Define features (X) by selecting the canonical feature columns
+            # (everything except 'id' and the target column 'CLASS_LABEL').
+            # The trees split on float32 internally, so the columns are parsed as float32 and
+            # copied once into a contiguous matrix instead of letting fit()/score() convert them.
+            # (The Pct* columns are fractions, so a narrower integer dtype would lose data.)
+            X = np.ascontiguousarray(df[FEATURE_NAMES].to_numpy(dtype=np.float32))
+            
+            # Define target variable (y)
+            y = df[TARGET_COLUMN].to_numpy()
         
         # Check if the feature set is empty
-        if X.empty:
+        if X.size == 0:
             print("ERROR: Feature matrix (X) is empty after dropping columns. Check CSV content.")
             return
 
     except FileNotFoundError:
         print(f"FATAL ERROR: The file {DATASET_PATH} was not found.")
         sys.exit(1)
-    except KeyError as e:
-        print(f"FATAL ERROR: Required column missing. Check if 'CLASS_LABEL' exists. Error: {e}")
+    except (KeyError, ValueError) as e:
+        # Missing columns are reported as a ValueError (pyarrow.ArrowInvalid is a subclass)
+        print(f"FATAL ERROR: Required column missing or not numeric. Check that 'CLASS_LABEL' and every FEATURE_NAMES column exist. Error: {e}")
         sys.exit(1)
     except Exception as e:
         print(f"An error occurred during data loading: {e}")
         sys.exit(1)
         
-    print(f"Dataset loaded. Total samples: {len(df)}")
+    print(f"Dataset loaded. Total samples: {len(y)}")
     print(f"Number of features being used: {X.shape[1]}")
 
-    # --- Feature List Saving (NEW) ---
-    feature_list = X.columns.tolist()
-    print(f"Saving {len(feature_list)} feature names to {FEATURES_FULL_PATH}...")
-    with open(FEATURES_FULL_PATH, 'w') as f:
-        json.dump(feature_list, f, indent=4)
+    # The column order the model is trained on; saved together with the model below
+    feature_list = list(FEATURE_NAMES)
     
     # --- Training ---
-    print("Training RandomForestClassifier...")
+    model = build_model()
+    print(f"Training {type(model).__name__}...")
     
-    # Split the data into training and testing sets
+    # Split the plain NumPy arrays into training and testing sets; stratifying keeps the
+    # phishing/legitimate ratio identical in both, so the test accuracy is not skewed
     X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
+        X, y, test_size=0.2, stratify=y, random_state=42
     )
 
-    # Initialize and train the model
-    model = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42)
+    # Train the model
     model.fit(X_train, y_train)
+    if 'n_jobs' in model.get_params():
+        # Parallelism is only wanted for fitting: the API scores one small batch per call from
+        # many worker threads, where joblib dispatch per predict_proba() would only add latency
+        model.set_params(n_jobs=None)
 
     # Evaluate the model (Optional, but good practice)
     accuracy = model.score(X_test, y_test)
     print(f"Model trained successfully. Test Accuracy: {accuracy:.4f}")
+    if USE_SKLEARNEX and isinstance(model, RandomForestClassifier):
+        print("Trained with Intel Extension for Scikit-learn (the API needs scikit-learn-intelex to load the .pkl)")
+    if hasattr(model, 'estimators_'):
+        node_count = sum(tree.tree_.node_count for tree in model.estimators_)
+        print(f"Total tree nodes: {node_count} across {len(model.estimators_)} trees")
 
     # --- Save Model ---
-    print(f"Saving model to {MODEL_FULL_PATH}...")
-    dump(model, MODEL_FULL_PATH)
-    print("Model saved successfully. You can now run 'python backend/app.py'")
+    # The model and its feature list go into ONE file, so the API can never pair a new model
+    # with an old feature list (or vice versa). It is written to a temporary file first and
+    # then renamed over the old one, which is atomic: the API sees either bundle, never half.
+    print(f"Saving model and {len(feature_list)} feature names to {MODEL_FULL_PATH}...")
+    # By default no compression: an uncompressed joblib file can be memory-mapped by the API
+    # (mmap_mode='r'). Protocol 5 pickles any remaining buffers out-of-band instead of copying.
+    compress = MODEL_COMPRESSION
+    if isinstance(compress, tuple) and compress[0] == 'lz4' and not LZ4_AVAILABLE:
+        print("WARNING: lz4 is not installed; compressing the model with zlib instead.")
+        compress = ('zlib', compress[1])
+    bundle = {'model': model, 'features': feature_list, 'schema': MODEL_BUNDLE_SCHEMA}
+    tmp_path = MODEL_FULL_PATH + '.tmp'
+    dump(bundle, tmp_path, compress=compress, protocol=5)
+    os.replace(tmp_path, MODEL_FULL_PATH)
+    print("Model saved successfully.")
+
+    # --- Export to ONNX ---
+    # Written after the pickle, so the API sees an up-to-date export and prefers it
+    if convert_model_to_onnx is not None:
+        print(f"Exporting model to ONNX at {ONNX_FULL_PATH}...")
+        try:
+            convert_model_to_onnx(model, X.shape[1], ONNX_FULL_PATH, feature_list)
+            max_diff = onnx_max_proba_diff(model, ONNX_FULL_PATH, X_test) if ort is not None else 0.0
+            if max_diff > ONNX_MAX_PROBA_DIFF:
+                # The API prefers the .onnx, so do not leave behind one that scores differently
+                os.remove(ONNX_FULL_PATH)
+                print(f"WARNING: The ONNX export disagrees with the trained model (max probability difference {max_diff:.4f}); "
+                      f"removed it, the API will use {MODEL_FULL_PATH}.")
+            else:
+                print("ONNX model saved successfully.")
+        except Exception as e:
+            # e.g. a skl2onnx release that cannot convert this estimator; the API serves the pickle
+            details = str(e).splitlines()[0] if str(e) else type(e).__name__
+            print(f"WARNING: ONNX export failed, the API will use {MODEL_FULL_PATH}. Details: {details}")
+    else:
+        print("WARNING: skl2onnx is not installed; skipping the ONNX export.")
+    print("You can now run 'python backend/app.py'")
 
 if __name__ == '__main__':
     train_and_save_model()